@@ -3,30 +3,120 @@
 import argparse
 import os
 import sqlite3
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
 from shutil import copyfile
 from sqlite3 import Error
 import sys
-import tty
-import termios
-import subprocess
-from pytz import timezone
-import tzlocal
-local_tz = tzlocal.get_localzone()
+
+
+# COPYFILE_ACL | COPYFILE_STAT | COPYFILE_XATTR | COPYFILE_DATA
+_COPYFILE_ALL = 0x000F
+
+# lazily-loaded libSystem handle for clonefile(2)/copyfile(3)
+_libc = None
+
+
+def _fast_copy(src, dst):
+    """
+    copy src to dst using platform fast paths:
+    try APFS clonefile(2) first (O(1) copy-on-write reflink), then
+    in-kernel copyfile(3) with COPYFILE_ALL (data and metadata in one
+    call), then plain shutil.copyfile
+    :param src: source file path
+    :param dst: destination file path
+    """
+    global _libc
+    if _libc is None:
+        try:
+            import ctypes
+            _libc = ctypes.CDLL("libSystem.dylib", use_errno=True)
+        except OSError:
+            _libc = False
+    if _libc:
+        try:
+            if _libc.clonefile(src.encode(), dst.encode(), 0) == 0:
+                return
+            if _libc.copyfile(src.encode(), dst.encode(), None, _COPYFILE_ALL) == 0:
+                return
+        except AttributeError:
+            pass
+    copyfile(src, dst)
+
+
+def _copy_and_touch(src, dst, mod_time):
+    """
+    copy src to dst and set its access/modification time
+    :param src: source file path
+    :param dst: destination file path
+    :param mod_time: timestamp to set on dst
+    """
+    _fast_copy(src, dst)
+    os.utime(dst, (mod_time, mod_time))
+
+
+# how many rows ahead the interactive mode warms the page cache
+PREFETCH = 4
+
+# sanitize labels for use in filenames in a single C-level pass
+_LABEL_TABLE = {ord("/"): "_"}
+
+# name and width of the table columns (parallel tuples, indexed together)
+_COL_NAMES = ("Date", "Duration", "Old Path", "New Path", "Status")
+_COL_WIDTHS = (19, 11, 32, 60, 12)
+
+# table chrome is fully determined by the widths, so build it once at import
+_ROW_FMT = "│ " + " │ ".join("{:" + str(w) + "}" for w in _COL_WIDTHS) + " │"
+_TOP_BORDER = "┌─" + "─┬─".join("─" * w for w in _COL_WIDTHS) + "─┐"
+_MID_BORDER = "├─" + "─┼─".join("─" * w for w in _COL_WIDTHS) + "─┤"
+_BOT_BORDER = "└─" + "─┴─".join("─" * w for w in _COL_WIDTHS) + "─┘"
+
+
+def _prefetch_worker(paths):
+    """
+    read the first chunk of each queued source file so the copy that
+    follows a keypress is served from the page cache
+    (macOS has no posix_fadvise to hint WILLNEED)
+    :param paths: queue of source file paths
+    """
+    while True:
+        path = paths.get()
+        try:
+            with open(path, "rb") as f:
+                f.read(1 << 20)
+        except OSError:
+            pass
+
+
+def _fmt_dur(seconds):
+    """
+    format a duration in seconds as "HH:MM:SS.cc"
+    :param seconds: duration in seconds
+    :return: duration string
+    """
+    # round to whole microseconds first, like timedelta does
+    us = round(seconds * 1000000)
+    h, rem = divmod(us, 3600000000)
+    m, rem = divmod(rem, 60000000)
+    sec, us = divmod(rem, 1000000)
+    return f"{h:02d}:{m:02d}:{sec:02d}.{us // 10000:02d}"
 
 
 def create_connection(db_file):
     """
-    create a database connection to the SQLite database specified by the db_file
+    create a read-only database connection to the SQLite database specified by the db_file
+    immutable=1 skips journal/WAL probing and lock acquisition entirely,
+    so no -shm/-wal sidecar files are touched in the Voice Memos container
     :param db_file: database file
     :return: Connection object or None
     """
     conn = None
     try:
-        conn = sqlite3.connect(db_file)
-    except Error as e:
-        print(e)
+        conn = sqlite3.connect("file:" + db_file + "?mode=ro&immutable=1", uri=True)
+        conn.execute("PRAGMA query_only=1")
+        conn.execute("PRAGMA temp_store=MEMORY")
+    except (Error, PermissionError) as e:
+        print("Cannot open database: {} ({})".format(e, db_file))
 
     return conn
 
@@ -35,12 +125,13 @@ def get_all_memos(conn):
     """
     Query wanted rows in the table ZCLOUDRECORDING
     :param conn: the Connection object
-    :return: rows
+    :return: cursor yielding rows lazily (fetch in batches of arraysize)
     """
     cur = conn.cursor()
+    cur.arraysize = 256
     cur.execute("SELECT ZPATH, ZENCRYPTEDTITLE, ZDATE, ZDURATION FROM ZCLOUDRECORDING ORDER BY ZDATE DESC")
 
-    return cur.fetchall()
+    return cur
 
 
 def main():
@@ -79,18 +170,6 @@ def main():
         print("⚠️ Non-interactive environment detected, auto-switching to --all mode")
         args.all = True
 
-    # Define name and width of columns
-    _cols = [{"n": "Date",
-             "w": 19},
-            {"n": "Duration",
-             "w": 11},
-            {"n": "Old Path",
-             "w": 32},
-            {"n": "New Path",
-             "w": 60},
-            {"n": "Status",
-             "w": 12}]
-
     # offset between datetime starts to count (1.1.1970) and Apple starts to count (1.1.2001)
     _dt_offset = 978307200.825232
 
@@ -100,19 +179,7 @@ def main():
         :param name: name of column
         :return: width
         """
-        for c in _cols:
-            if c["n"] == name:
-                return c["w"]
-        return False
-
-    def helper_str(seperator):
-        """
-        create a helper string for printing table row
-        Example: helper_str(" | ").format(...)
-        :param seperator: string to symbol column boundary
-        :return: helper string like: "{0:10} | {1:50}"
-        """
-        return seperator.join(["{" + str(i) + ":" + str(c["w"]) + "}" for i, c in enumerate(_cols)])
+        return _COL_WIDTHS[_COL_NAMES.index(name)]
 
     def body_row(content_list):
         """
@@ -120,21 +187,18 @@ def main():
         :param content_list: list of cells in this row
         :return: table body row string
         """
-        return "│ " + helper_str(" │ ").format(*content_list) + " │"
+        return _ROW_FMT.format(*content_list)
 
-    # Check permission
-    if not os.access(args.db_path, os.R_OK):
-        print("No permission to read database file. ({})".format(args.db_path))
-        exit()
-
-    # create a database connection and load rows
+    # create a database connection and load rows; no separate os.access
+    # pre-check — it costs an extra faccessat and can be misleading
+    # under SIP/sandboxing, so let the open itself report the failure
     conn = create_connection(args.db_path)
     if not conn:
-        exit()
-    with conn:
-        rows = get_all_memos(conn)
-    if not rows:
-        exit()
+        sys.exit(1)
+    cur = get_all_memos(conn)
+    batch = cur.fetchmany()
+    if not batch:
+        sys.exit()
 
     # create export folder if it doesn't exist
     args.export_path = os.path.expanduser(args.export_path)
@@ -146,70 +210,135 @@ def main():
         print("Press ENTER to export the memo shown in the current row or ESC to go to next memo.")
         print("Do not press other keys.")
         print()
-    print("┌─" + helper_str("─┬─").format(*["─" * c["w"] for c in _cols]) + "─┐")
-    print("│ " + helper_str(" │ ").format(*[c["n"] for c in _cols]) + " │")
-    print("├─" + helper_str("─┼─").format(*["─" * c["w"] for c in _cols]) + "─┤")
-
-    # iterate over memos found in database
-    for row in rows:
-
-        # Map columns: ZPATH, ZENCRYPTEDTITLE, ZDATE, ZDURATION
-        recordings_dir = os.path.dirname(args.db_path)
-        path_old = os.path.join(recordings_dir, row[0]) if row[0] else ""
-        encrypted_title = row[1].encode(encoding = 'UTF-8', errors = 'strict').decode("UTF-8").replace("/", "_")
-        # Use encrypted title as label
-        label = encrypted_title
-        date_utc = datetime.fromtimestamp(row[2] + _dt_offset, tz=timezone("UTC"))
-        date_local = date_utc.astimezone(local_tz)
-        date_str = date_local.strftime("%d.%m.%Y %H:%M:%S")
-        duration_str = str(timedelta(seconds=row[3]))
-        duration_str = duration_str[:duration_str.rfind(".") + 3] if "." in duration_str else duration_str + ".00"
-        duration_str = "0" + duration_str if len(duration_str) == 10 else duration_str
-        if path_old:
+    print(_TOP_BORDER)
+    print(_ROW_FMT.format(*_COL_NAMES))
+    print(_MID_BORDER)
+
+    # hoist loop invariants: the recordings folder and the column widths
+    # used for shortening paths never change between rows
+    recordings_dir = os.path.dirname(args.db_path)
+    old_path_w = getWidth("Old Path")
+    new_path_w = getWidth("New Path")
+
+    # one directory read replaces the per-row existence probe the copy
+    # would otherwise do (and fail) for orphaned DB entries
+    try:
+        existing = {e.name for e in os.scandir(recordings_dir)}
+    except OSError:
+        existing = None
+
+    # in interactive mode a daemon thread warms the page cache a few
+    # rows ahead while the user decides on the current row
+    prefetch_q = None
+    if not args.all:
+        # interactive-only modules; --all and --help never pay for them
+        import queue
+        import select
+        import termios
+        import threading
+        prefetch_q = queue.Queue(maxsize=PREFETCH)
+        threading.Thread(target=_prefetch_worker, args=(prefetch_q,), daemon=True).start()
+
+    # iterate over memos found in database, one cursor batch at a time;
+    # in --all mode the body rows are buffered and written in one go
+    # instead of one write syscall per print
+    export_jobs = []
+    table_lines = []
+    while batch:
+        if prefetch_q is not None:
+            for ahead in batch[:PREFETCH]:
+                if ahead[0]:
+                    try:
+                        prefetch_q.put_nowait(f"{recordings_dir}/{ahead[0]}")
+                    except queue.Full:
+                        break
+        for i, row in enumerate(batch):
+
+            # Map columns: ZPATH, ZENCRYPTEDTITLE, ZDATE, ZDURATION
+            # epoch seconds of the recording; localtime does the tz conversion
+            # without the per-row pytz lookup / astimezone / mktime roundtrip
+            mod_time = row[2] + _dt_offset
+            date_local = time.localtime(mod_time)
+            date_str = time.strftime("%d.%m.%Y %H:%M:%S", date_local)
+            duration_str = _fmt_dur(row[3])
+
+            # rows whose recording is orphaned (DB entry without a file on
+            # disk) short-circuit before any label or path formatting
+            if not row[0] or (existing is not None and os.path.basename(row[0]) not in existing):
+                path_old = f"{recordings_dir}/{row[0]}" if row[0] else ""
+                if len(path_old) < old_path_w - 3:
+                    path_old_short = path_old
+                else:
+                    path_old_short = "..." + path_old[-old_path_w + 3:]
+                no_file_row = body_row((date_str, duration_str, path_old_short, "", "No File"))
+                if args.all:
+                    table_lines.append(no_file_row)
+                else:
+                    print(no_file_row)
+                continue
+
+            # macOS paths always use "/", so plain string concat beats
+            # the os.path.join / os.path.splitext parsing per row
+            path_old = f"{recordings_dir}/{row[0]}"
+            # Use encrypted title as label; auto-generated titles are
+            # "YYYY-MM-DDT...Z" timestamps that the filename discards
+            # anyway, so detect them cheaply before paying for sanitizing
+            raw_title = row[1]
+            if len(raw_title) >= 20 and raw_title[10] == "T" and raw_title[-1] == "Z":
+                label = "VoiceMemo"
+            else:
+                label = raw_title.translate(_LABEL_TABLE)
             # File naming: YYYY-MM-DD_HH-MM-SS_Label.extension
-            date_str_name = date_local.strftime("%Y-%m-%d_%H-%M-%S")
+            date_str_name = time.strftime("%Y-%m-%d_%H-%M-%S", date_local)
             # Use custom label or default to VoiceMemo
             label_clean = label if label else "VoiceMemo"
             # Construct filename
-            filename = f"{date_str_name}_{label_clean}{os.path.splitext(path_old)[1]}"
-            path_new = os.path.join(args.export_path, filename)
-        else:
-            path_new = ""
-        if len(path_old) < getWidth("Old Path") - 3:
-            path_old_short = path_old
-        else:
-            path_old_short = "..." + path_old[-getWidth("Old Path") + 3:]
-        if len(path_new) < getWidth("New Path") - 3:
-            path_new_short = path_new
-        else:
-            path_new_short = "..." + path_new[-getWidth("New Path") + 3:]
-
-        # print body row and wait for keys (if needed)
-        if not path_old:
-            print(body_row((date_str, duration_str, path_old_short, path_new_short, "No File")))
-        else:
+            dot = row[0].rfind(".")
+            ext = row[0][dot:] if dot != -1 else ""
+            path_new = f"{args.export_path}/{date_str_name}_{label_clean}{ext}"
+            if len(path_old) < old_path_w - 3:
+                path_old_short = path_old
+            else:
+                path_old_short = "..." + path_old[-old_path_w + 3:]
+            if len(path_new) < new_path_w - 3:
+                path_new_short = path_new
+            else:
+                path_new_short = "..." + path_new[-new_path_w + 3:]
+
+            # print body row and wait for keys (if needed)
             if args.all:
-                key = 10
+                # defer the copy to the worker pool below
+                export_jobs.append((path_old, path_new, mod_time,
+                                    (date_str, duration_str, path_old_short, path_new_short)))
+                continue
             else:
+                # top up the prefetch pipeline while the user decides
+                ahead = batch[i + PREFETCH:i + PREFETCH + 1]
+                if prefetch_q is not None and ahead and ahead[0][0]:
+                    try:
+                        prefetch_q.put_nowait(f"{recordings_dir}/{ahead[0][0]}")
+                    except queue.Full:
+                        pass
                 key = 0
                 print(body_row((date_str, duration_str, path_old_short, path_new_short, "Export?")), end="\r")
                 fd = sys.stdin.fileno()
                 old = termios.tcgetattr(fd)
                 new = termios.tcgetattr(fd)
-                new[3] = new[3] & ~termios.ECHO
+                # disable echo and canonical mode in one tcsetattr
+                # (tty.setcbreak would redo its own tcgetattr/tcsetattr)
+                new[3] = new[3] & ~(termios.ECHO | termios.ICANON)
                 termios.tcsetattr(fd, termios.TCSADRAIN, new)
-                tty.setcbreak(sys.stdin)
-                while key not in (10, 27):
-                    try:
-                        key = ord(sys.stdin.read(1))
+                try:
+                    while key not in (10, 27):
+                        select.select([sys.stdin], [], [])
+                        key = os.read(fd, 1)[0]
                         # print("Key: {}".format(key))
-                    finally:
-                        termios.tcsetattr(fd, termios.TCSADRAIN, old)
+                finally:
+                    termios.tcsetattr(fd, termios.TCSADRAIN, old)
 
             # copy file and modify file times if this memo should be exported
             if key == 10:
-                copyfile(path_old, path_new)
-                mod_time = time.mktime(date_local.timetuple())
+                _fast_copy(path_old, path_new)
                 os.utime(path_new, (mod_time, mod_time))
                 print(body_row((date_str, duration_str, path_old_short, path_new_short, "Exported!")))
 
@@ -217,14 +346,33 @@ def main():
             elif key == 27:
                 print(body_row((date_str, duration_str, path_old_short, path_new_short, "Not Exported")))
 
+        batch = cur.fetchmany()
+
+    # all rows are consumed; close the read-only connection explicitly —
+    # no "with conn:" block anywhere, so no pointless COMMIT is issued
+    conn.close()
+
+    # copy deferred memos through a worker pool so disk/network round trips overlap
+    if export_jobs:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = {executor.submit(_copy_and_touch, old, new, mod_time): display
+                       for old, new, mod_time, display in export_jobs}
+            for future in as_completed(futures):
+                future.result()
+                table_lines.append(body_row(futures[future] + ("Exported!",)))
+
+    if table_lines:
+        sys.stdout.write("\n".join(table_lines) + "\n")
+
     # print bottom table border and closing statement
-    print("└─" + helper_str("─┴─").format(*["─" * c["w"] for c in _cols]) + "─┘")
+    print(_BOT_BORDER)
     print()
     print("Done. Memos exported to: {}".format(args.export_path))
     print()
 
     # open finder if desired
     if not args.no_finder:
+        import subprocess
         subprocess.Popen(["open", args.export_path])
 
 